@@ -0,0 +1,56 @@
+# radial.py - Kernels which map radial (theta, r) points, taken w.r.t. the
+# rover's orientation, into the cartesian space of the `env` view.
+
+import math
+
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+# Degrees to radians:
+DEG = math.pi / 180.0
+
+# The cosines and sines of every whole degree which the servo can be turned
+# to, i.e. `COS_DEG[theta]` is the cosine of `theta` degrees:
+COS_DEG = np.cos(np.deg2rad(np.arange(181, dtype = np.float64)))
+SIN_DEG = np.sin(np.deg2rad(np.arange(181, dtype = np.float64)))
+COS_DEG.setflags(write = False)
+SIN_DEG.setflags(write = False)
+
+
+def rt2xy(theta, r, direction, x0, y0):
+    """ Maps the single radial point (`theta`, `r`) into the cartesian space
+    of a rover located at (`x0`, `y0`) and facing `direction`. Angles are
+    measured in degrees. Returns a 2-tuple of xy-coordinates. """
+
+    phi = (theta - 90.0 + direction) * DEG
+    return (r * math.cos(phi) + x0, r * math.sin(phi) + y0)
+
+
+
+
+def _rot_arr(ct, st, rs, cd, sd, x0, y0, out):
+    """ The array version of `rt2xy()`, given the cosines `ct` and sines `st`
+    of the scan angles and the cosine `cd` and sine `sd` of the rover's
+    direction. Each of these radial points, whose distances are in `rs`, is
+    mapped into the corresponding row of the two-column array `out`. """
+
+    for i in numba.prange(len(rs)):
+        out[i, 0] = rs[i] * (st[i] * cd + ct[i] * sd) + x0
+        out[i, 1] = rs[i] * (st[i] * sd - ct[i] * cd) + y0
+
+
+
+
+# When `numba` is available, both kernels are compiled to machine code.
+# Otherwise `rt2xy()` stays plain python and there is no `rot_arr()`, in
+# which case the caller should fall back to `numpy`.
+if numba is not None:
+    rt2xy = numba.njit(cache = True, fastmath = True)(rt2xy)
+    rot_arr = numba.njit(parallel = True, fastmath = True)(_rot_arr)
+else:
+    rot_arr = None
@@ -1,5 +1,7 @@
 import sys
 import math
+import functools
+import contextlib
 
 import numpy as np
 import scipy
@@ -8,9 +10,12 @@ from scipy.interpolate import LSQUnivariateSpline
 import matplotlib
 import matplotlib.pyplot as plt
 from matplotlib.patches import Wedge, Circle
+from matplotlib.collections import EllipseCollection
+from matplotlib.transforms import Bbox
 
 import sentinel
 import sensors
+import radial
 import ir
 import oi
 import sonar
@@ -20,6 +25,19 @@ from codes import OIStopID
 
 DEFAULT_CALIBRATION_DATA_DIR = 'calibrate/data/default'
 
+# Once more than this many scan points of one sensor are plotted in `env`,
+# they are thinned out to one point per square of `SCAN_POINT_RES` cm. At the
+# scale of the `env` view, points closer than this can't be told apart.
+MAX_SCAN_POINTS = 20000
+SCAN_POINT_RES = 2.0
+
+# The radius (in cm) of the breadcrumbs marking where the rover has stopped:
+BREADCRUMB_RADIUS = 16.25
+
+# The knots from which the contour of each object cloud is regressed. Every
+# contour uses those knots of this grid that lie within its angular range.
+CONTOUR_KNOTS = np.linspace(0, 180, 61)
+
 
 zorders = {
     'breadcrumbs': 0,
@@ -36,10 +54,110 @@ zorders = {
 }
 
 
+@functools.lru_cache(maxsize = 64)
+def _contour_knots(lo, hi):
+    """ Returns the interior knots of `CONTOUR_KNOTS` used to regress a contour
+    over the angles [`lo`, `hi`]. Knots within a degree of either end are
+    left out, so that every spline segment is fit by enough data. """
+    knots = CONTOUR_KNOTS[(CONTOUR_KNOTS > lo + 1) & (CONTOUR_KNOTS < hi - 1)]
+    knots.setflags(write = False)
+    return knots
+
+
+
+
+def _regress_object_cloud(thetas, rs):
+    """ Regresses the contour of a single object cloud, given as the parallel
+    `np.ndarray` objects `thetas`, the angles (measured in degrees), sorted,
+    and `rs`, the corresponding distances, as found by
+    `Scanner.find_obj_clouds()`. The contour is a cubic least squares spline,
+    which maps angles to distances. """
+
+    knots = _contour_knots(float(thetas[0]), float(thetas[-1]))
+    return LSQUnivariateSpline(thetas, rs, knots, k = 3)
+
+
+
+
+@functools.lru_cache(maxsize = 8)
+def _scan_grid(servo_conv, start, end):
+    """ Returns a 2-tuple of read-only `np.ndarray` objects: the integer
+    angles (measured in degrees) visited by a scan from `start` to `end`,
+    inclusive, and the corresponding servo pulse widths, as given by the
+    `servo_conv` converter. Almost every scan is over the same range, so the
+    most recently requested grids are cached. """
+
+    if start <= end:
+        angles = np.arange(start, end + 1, dtype = np.int32)
+    else:
+        angles = np.arange(end, start + 1, dtype = np.int32)[::-1]
+
+    pulse_widths = np.ascontiguousarray(servo_conv(angles))
+
+    angles.setflags(write = False)
+    pulse_widths.setflags(write = False)
+    return (angles, pulse_widths)
+
+
+
+
+def _decimate(pts, res):
+    """ Thins out the given two-column array of xy-coordinates by snapping
+    them to a grid of squares with sides of length `res` and keeping a single
+    point, the center, of each square that contains any. Points with NaN
+    coordinates are dropped. A new array is returned. """
+
+    pts = pts[~np.isnan(pts).any(axis = 1)]
+    cells = np.unique(np.floor(pts / res).astype(np.int32), axis = 0)
+    return (cells + 0.5) * res
+
+
+
+
+
+
+
+
+
+def _reserve_rows(buf, n, k):
+    """ Makes room for `k` more rows in the two-column `np.ndarray` buffer
+    `buf`, just after its first `n` rows, which are in use. If `buf` is too
+    small, its capacity is doubled (as many times as needed) by copying it
+    into a new buffer. Returns the buffer which has room for these rows. """
+
+    if n + k > len(buf):
+        cap = max(len(buf), 1)
+        while cap < n + k:
+            cap *= 2
+        new_buf = np.empty((cap, buf.shape[1]), dtype = buf.dtype)
+        new_buf[:n] = buf[:n]
+        buf = new_buf
+
+    return buf
+
+
+
+
+
+
+
+
+
 class Environment():
     """ Rover presents a to the user the `env` map, which depicts those
     elements of the environment which it has discovered. """
 
+    # The `view` is redrawn after nearly every movement and scan, so attribute
+    # lookups are kept to fixed slots. `__weakref__` is kept because matplotlib
+    # holds its event callbacks (e.g. `_on_draw()`) as weak references.
+    __slots__ = ('_loc', '_direction', '_cos_dir', '_sin_dir', '_scratch',
+                 '_trig_thetas', '_trig', '_draw_depth', '_draw_pending',
+                 '_blit_pending', '_bg', 'breadcrumbs',
+                 'bumps', 'cliffs', 'drops', 'tape', '_ir_buf', '_ir_len',
+                 '_sonar_buf', '_sonar_len', '_ir_pts', '_sonar_pts',
+                 'objects', 'scan_field', 'view', '_ir_col', '_sonar_col',
+                 '_bread_col', '_bread_drawn', '__weakref__')
+
     def __init__(self):
         # Distance scan and event data is mapped onto the cartesian space
         # defined w.r.t. the robot's initial orientation. So the robot's
@@ -50,14 +168,40 @@ class Environment():
         self._loc = (0.0, 0.0)
         self._direction = 90.0
 
-        # The axis onto which the environment is plotted:
-        self.view = plt.figure().add_subplot(111, aspect='equal')
-        self.view.set_xlim(-300, 300)
-        self.view.set_ylim(-300, 300)
+        # The cosine and sine of `_direction`, kept up to date by
+        # `direction()`, for use by `conv_radial_arr()`:
+        self._cos_dir = math.cos(math.radians(self._direction))
+        self._sin_dir = math.sin(math.radians(self._direction))
+
+        # Scratch space used by `conv_radial_arr()`. It grows to fit the
+        # longest scan which has been converted.
+        self._scratch = np.empty((2, 0), dtype = np.float64)
+
+        # The most recent scan angles seen by `conv_radial_arr()`, along with
+        # their cosines and sines. See `_theta_trig()`.
+        self._trig_thetas = None
+        self._trig = None
+
+        # The number of `batch()` contexts currently entered. While this is
+        # positive, `draw()` and `_blit()` only record what they were asked to
+        # do: `_draw_pending` is whether a full draw was requested, and
+        # `_blit_pending` is the list of artists passed to `_blit()`, or `None`
+        # if it wasn't called. See `batch()`.
+        self._draw_depth = 0
+        self._draw_pending = False
+        self._blit_pending = None
+
+        # The rendered background of the `view`, which is captured after each
+        # full draw and used to blit small updates. `None` when there isn't a
+        # valid one. It excludes the animated artists, i.e. the `scan_field`
+        # and everything which is drawn over it. See `_draw_animated()`.
+        self._bg = None
 
         # A list of places in the `view` where the rover has previously
-        # stopped. These are patch objects which have been added to the `view`.
+        # stopped. These are 2-tuples of xy-coordinates. Only the first
+        # `_bread_drawn` of them are part of the background `_bg`.
         self.breadcrumbs = []
+        self._bread_drawn = 0
 
         # The dangers that the rover has found so far. These are lists of
         # patch objects which have been added to the `view`
@@ -66,23 +210,76 @@ class Environment():
         self.drops = []
         self.tape = []
 
-        # Point observations found in scans and mapped to `env` space.
-        # In particular, these are `collection` objects which have been added
-        # to the `view`.
-        self.ir_obs = []
-        self.sonar_obs = []
+        # Point observations found in scans and mapped to `env` space. These
+        # are stored as two-column `np.ndarray` buffers of xy-coordinates,
+        # whose capacity is doubled whenever they fill up. Only the first
+        # `_ir_len` (or `_sonar_len`) rows are used. See `ir_obs` and
+        # `sonar_obs`.
+        self._ir_buf = np.empty((256, 2), dtype = np.float64)
+        self._ir_len = 0
+        self._sonar_buf = np.empty((256, 2), dtype = np.float64)
+        self._sonar_len = 0
+
+        # All of the points of `ir_obs` and `sonar_obs` are drawn by a single
+        # collection for each sensor, whose offsets are updated as scans are
+        # added. These offsets, `_ir_pts` and `_sonar_pts`, are views of the
+        # observations until there are too many of them to be plotted; from
+        # then on they are thinned out copies.
+        self._ir_pts = np.empty((0, 2), dtype = np.float64)
+        self._sonar_pts = np.empty((0, 2), dtype = np.float64)
 
         # Objects discovered and plotted.
         self.objects = []
 
-        # A semi-circle `Wedge` object that indicates the rover's current
-        # location and direction:
+        # A semi-circle that indicates the rover's current location and
+        # direction. It is created by `update_scan_field()`.
         self.scan_field = None
-        self.update_scan_field()
+
+        self._init_view()
         self.draw()
 
 
 
+
+    def _init_view(self):
+        """ Creates the `view` onto which the environment is plotted, along
+        with the artists which are kept for the lifetime of the `Environment`.
+        """
+
+        # The axis onto which the environment is plotted:
+        self.view = plt.figure().add_subplot(111, aspect='equal')
+        self.view.set_xlim(-300, 300)
+        self.view.set_ylim(-300, 300)
+
+        # Notice that IR points are drawn slightly larger than sonar points.
+        self._ir_col = self.view.scatter([], [], s = 8)
+        self._ir_col.set_edgecolor('none')
+        self._ir_col.set_facecolor('blue')
+        self._ir_col.set_zorder(zorders['scan_data'])
+
+        self._sonar_col = self.view.scatter([], [], s = 7)
+        self._sonar_col.set_edgecolor('none')
+        self._sonar_col.set_facecolor('green')
+        self._sonar_col.set_zorder(zorders['scan_data'])
+        self._ir_col.set_animated(True)
+        self._sonar_col.set_animated(True)
+
+        # All breadcrumbs are drawn by a single collection of circles, whose
+        # size is measured in `env` units:
+        d = 2 * BREADCRUMB_RADIUS
+        self._bread_col = EllipseCollection([d], [d], [0], units = 'xy',
+                                offsets = np.empty((0, 2)),
+                                offset_transform = self.view.transData)
+        self._bread_col.set_facecolor('0.65')  # grey
+        self._bread_col.set_edgecolor('black')
+        self._bread_col.set_zorder(zorders['breadcrumbs'])
+        self.view.add_collection(self._bread_col, autolim = False)
+
+        self.update_scan_field()
+        self.view.figure.canvas.mpl_connect('draw_event', self._on_draw)
+
+
+
     
 
     def __del__(self):
@@ -91,6 +288,26 @@ class Environment():
 
 
 
+    @property
+    def ir_obs(self):
+        """ A two-column `np.ndarray` of the xy-coordinates of every IR point
+        observation which has been added to the `Environment`. This is a view
+        of the internal buffer, so it should not be modified. """
+        return self._ir_buf[:self._ir_len]
+
+
+
+
+    @property
+    def sonar_obs(self):
+        """ A two-column `np.ndarray` of the xy-coordinates of every sonar
+        point observation which has been added to the `Environment`. This is a
+        view of the internal buffer, so it should not be modified. """
+        return self._sonar_buf[:self._sonar_len]
+
+
+
+
     def loc(self, new_loc = None):
         """ Gets the current location, a 2-tuple of xy-coordinates, if there is
         no `new_loc` argument. Otherwise, sets `new_loc` as the current
@@ -101,7 +318,7 @@ class Environment():
         else:
             self._loc = new_loc
             self.update_scan_field()
-            self.draw()
+            self._blit()
 
 
 
@@ -110,9 +327,10 @@ class Environment():
         """ Updates the rover's location in the Environment by translating its
         position forward by the given `dist`. """
         
-        self.add_breadcrumb()
-        new_loc = self.conv_radial(90, dist)
-        self.loc(new_loc)
+        with self.batch():
+            self.add_breadcrumb()
+            new_loc = self.conv_radial(90, dist)
+            self.loc(new_loc)
 
 
 
@@ -127,8 +345,10 @@ class Environment():
             return self._direction
         else:
             self._direction = new_direction
+            self._cos_dir = math.cos(math.radians(new_direction))
+            self._sin_dir = math.sin(math.radians(new_direction))
             self.update_scan_field()
-            self.draw()
+            self._blit()
         # TODO: normalize `_direction` to (-180.0, 180.0] or [0.0, 360.0)
 
 
@@ -147,64 +367,96 @@ class Environment():
         xprime = x + r * (np.cos(theta + delta) - np.cos(theta))
         yprime = y + r * (np.sin(theta + delta) - np.sin(theta))
 
-        self.loc((xprime, yprime))
-        self.direction(self._direction + delta)
+        with self.batch():
+            self.loc((xprime, yprime))
+            self.direction(self._direction + delta)
 
 
 
 
     def add_scan(self, scan_data, cartesian = False):
         """ Adds the given `scan` data (expected to have been generated by
-        `rover.scan()`) to the environment and updates the plot. """
+        `rover.scan()`) to the environment and updates the plot.
 
-        ir_data, sonar_data = scan_data
+        If `cartesian` is true, then `scan_data` is instead expected to be a
+        2-tuple of two-column `np.ndarray` objects, containing the
+        xy-coordinates in `env` space of the IR and of the sonar points. """
 
+        # The new points are written into the observation buffers, just after
+        # those which are already in use.
         if cartesian == False:
-            # Convert from radial to cartesian coordinates.
-            ir_data = self.conv_radial_arr(ir_data[:, 0], ir_data[:, 1])
-            sonar_data = self.conv_radial_arr(sonar_data[:, 0], sonar_data[:, 1])
-            self.ir_obs.append(ir_data)
-            self.sonar_obs.append(sonar_data)
-        
-        # Notice that IR points are drawn slightly larger than sonar points.
+            thetas, ir_rs, sonar_rs = scan_data
+            n = len(thetas)
+            self._ir_buf = _reserve_rows(self._ir_buf, self._ir_len, n)
+            self._sonar_buf = _reserve_rows(self._sonar_buf, self._sonar_len,
+                                                                          n)
+
+            # Convert from radial to cartesian coordinates, in place:
+            ir_data = self.conv_radial_arr(thetas, ir_rs,
+                            out = self._ir_buf[self._ir_len:self._ir_len + n])
+            sonar_data = self.conv_radial_arr(thetas, sonar_rs,
+                  out = self._sonar_buf[self._sonar_len:self._sonar_len + n])
+        else:
+            ir_data, sonar_data = scan_data
+            self._ir_buf = _reserve_rows(self._ir_buf, self._ir_len,
+                                                            len(ir_data))
+            self._ir_buf[self._ir_len:self._ir_len + len(ir_data)] = ir_data
+            self._sonar_buf = _reserve_rows(self._sonar_buf, self._sonar_len,
+                                                            len(sonar_data))
+            self._sonar_buf[self._sonar_len:
+                            self._sonar_len + len(sonar_data)] = sonar_data
+
+        self._ir_len += len(ir_data)
+        if self._ir_len <= MAX_SCAN_POINTS:
+            self._ir_pts = self.ir_obs
+        else:
+            self._ir_pts = _decimate(np.vstack([self._ir_pts, ir_data]),
+                                                           SCAN_POINT_RES)
 
-        col = self.view.scatter(ir_data[:, 0], ir_data[:, 1], s = 8)
-        col.set_edgecolor('none')
-        col.set_facecolor('blue')
-        col.set_zorder(zorders['scan_data'])
-        self.ir_obs(append(col))
-        
-        col = self.view.scatter(sonar_data[:, 0], sonar_data[:, 1], s = 7)
-        col.set_edgecolor('none')
-        col.set_facecolor('green')
-        col.set_zorder(zorders['scan_data'])
-        self.sonar_obs(append(col))
-        
-        self.draw()
+        self._sonar_len += len(sonar_data)
+        if self._sonar_len <= MAX_SCAN_POINTS:
+            self._sonar_pts = self.sonar_obs
+        else:
+            self._sonar_pts = _decimate(np.vstack([self._sonar_pts,
+                                            sonar_data]), SCAN_POINT_RES)
+
+        self._update_scan_pts()
+        self._blit()
 
 
 
 
     def clear_scans(self):
-        """ Removes all of the points collections that have been added to the
+        """ Removes all of the scan points that have been added to the
         `Environment`. """
 
-        for col in self.ir_obs:
-            col.remove()
+        self._ir_len = 0
+        self._sonar_len = 0
 
-        for col in self.sonar_obs:
-            col.remove()
+        self._ir_pts = np.empty((0, 2), dtype = np.float64)
+        self._sonar_pts = np.empty((0, 2), dtype = np.float64)
 
-        self.draw()
+        self._update_scan_pts()
+        self._blit()
+
+
+
+
+    def _update_scan_pts(self):
+        """ Updates the plotted scan points to `_ir_pts` and `_sonar_pts`.
+        These are animated, so the `view` only needs to be blitted after they
+        change. """
+        self._ir_col.set_offsets(self._ir_pts)
+        self._sonar_col.set_offsets(self._sonar_pts)
 
 
 
 
-    def add_object(r, theta, obj_radius):
+    def add_object(self, theta, r, obj_radius):
         """ Adds an object at the given location. This location is given as a
         radial measure w.r.t. the object's current location. """
 
-        c = Circle(self.conv_radial(r, theta), obj_radius)
+        c = Circle(self.conv_radial(theta, r), obj_radius)
         self.objects.append(c)
 
 
@@ -212,14 +464,45 @@ class Environment():
 
     def add_breadcrumb(self):
         """ Adds a breadcrumb """
-        c = Circle(self._loc, radius = 16.25)
+        self.breadcrumbs.append(self._loc)
+        self._bread_col.set_offsets(self.breadcrumbs)
+
+        # The dangers are drawn over the breadcrumbs, so a breadcrumb which
+        # overlaps one of them can't just be blitted onto the background.
+        if self._overlaps_danger(self._loc, BREADCRUMB_RADIUS):
+            self.draw()
+        else:
+            self._blit(self._bread_col)
+
+
+
+
+    def _overlaps_danger(self, xy, radius):
+        """ Returns whether a circle with the given `radius` centered at `xy`
+        may overlap any of the dangers in the `view`. Their extents on the
+        canvas are compared, with a couple of pixels to spare for their edges.
+        """
+
+        x, y = xy
+        corners = [(x - radius, y - radius), (x + radius, y + radius)]
+        extent = Bbox(self.view.transData.transform(corners)).padded(2)
+
+        return any(extent.overlaps(c.get_window_extent().padded(2))
+                for c in self.bumps + self.cliffs + self.drops + self.tape)
+
+
+
+
+    def _add_circle(self, radius, zorder):
+        """ Adds a grey circle with the given `radius` to the `view` at the
+        current location, and returns it. """
+        c = Circle(self._loc, radius = radius)
         c.set_facecolor('0.65')  # grey
         c.set_edgecolor('black')
-        c.set_zorder(zorders['breadcrumbs'])
+        c.set_zorder(zorder)
         c.set_fill(True)
         self.view.add_artist(c)
-        self.breadcrumbs.append(c)
-        self.draw()
+        return c
 
 
 
@@ -270,42 +553,22 @@ class Environment():
         # Plot
         if (1 <= danger_id <= 3): # Bumper range in OIStopID
             """ Adds a bump """
-            c = Circle(self._loc, radius = 6.25)
-            c.set_facecolor('0.65')  # grey
-            c.set_edgecolor('black')
-            c.set_zorder(zorders['bumps'])
-            c.set_fill(True)
-            self.view.add_artist(c)
+            c = self._add_circle(6.25, zorders['bumps'])
             self.bumps.append(c)
             self.draw()
         elif (4 <= danger_id <= 7): # Cliff range in OIStopID
             """ Adds a cliff """
-            c = Circle(self._loc, radius = 6.25)
-            c.set_facecolor('0.65')  # grey
-            c.set_edgecolor('black')
-            c.set_zorder(zorders['cliffs'])
-            c.set_fill(True)
-            self.view.add_artist(c)
+            c = self._add_circle(6.25, zorders['cliffs'])
             self.cliffs.append(c)
             self.draw()
         elif (12 <= danger_id <= 14): # Drop range in OIStopID
             """ Adds a drop """
-            c = Circle(self._loc, radius = 6.25)
-            c.set_facecolor('0.65')  # grey
-            c.set_edgecolor('black')
-            c.set_zorder(zorders['drops'])
-            c.set_fill(True)
-            self.view.add_artist(c)
+            c = self._add_circle(6.25, zorders['drops'])
             self.drops.append(c)
             self.draw()
         elif (8 <= danger_id <= 11): # White tape range in OIStopID
             """ Adds tape """
-            c = Circle(self._loc, radius = 6.25)
-            c.set_facecolor('0.65')  # grey
-            c.set_edgecolor('black')
-            c.set_zorder(zorders['tape'])
-            c.set_fill(True)
-            self.view.add_artist(c)
+            c = self._add_circle(6.25, zorders['tape'])
             self.tape.append(c)
             self.draw()
         else:
@@ -324,10 +587,14 @@ class Environment():
         whenever either location or needs to be
         called as part of the rover's move and rotate functions.) """
 
-        # Remove the old scan field, if there is one:
+        # If there is already a scan field, it is moved in place. Its path is
+        # regenerated lazily the next time it is drawn.
         w = self.scan_field
         if w != None:
-            self.view.artists.remove(w)
+            w.set_center(self._loc)
+            w.set_theta1(self._direction - 90)
+            w.set_theta2(self._direction + 90)
+            return
 
         # Make a semi-circle with radius 100 at the current rover location:
         w = Wedge(self._loc, 100, self._direction - 90, self._direction + 90)
@@ -336,6 +603,10 @@ class Environment():
         w.set_zorder(zorders['scan_field'])
         w.set_fill(True)
 
+        # The scan field moves often, so it isn't part of the background. It
+        # is drawn on top of it by `_draw_animated()`.
+        w.set_animated(True)
+
         self.view.add_artist(w)
         self.scan_field = w
 
@@ -348,36 +619,149 @@ class Environment():
 
         self.view.set_xlim(xlim[0], xlim[1])
         self.view.set_ylim(ylim[0], ylim[1])
+        self._bg = None
         self.draw()
 
 
 
 
+    @contextlib.contextmanager
+    def batch(self):
+        """ A context manager within which calls to `draw()` and `_blit()` are
+        deferred. The view is updated once when the outermost `batch()` exits,
+        so that a sequence of updates causes a single redraw. If none of these
+        updates required a full draw, the view is just blitted. """
+
+        self._draw_depth += 1
+        try:
+            yield self
+        finally:
+            self._draw_depth -= 1
+            if self._draw_depth == 0:
+                draw_pending, self._draw_pending = self._draw_pending, False
+                blit_pending, self._blit_pending = self._blit_pending, None
+                if draw_pending:
+                    self._draw()
+                elif blit_pending is not None:
+                    self._blit(*blit_pending)
+
+
+
+
     def draw(self):
-        """ Refreshes the view of the `env`. """
+        """ Refreshes the view of the `env`, unless this is being done within
+        a `batch()`. """
+        if self._draw_depth == 0:
+            self._draw()
+        else:
+            self._draw_pending = True
+
+
+
+
+    def _draw(self):
+        """ Refreshes the view of the `env` unconditionally. """
         self.view.relim()
         self.view.autoscale_view(True, True, True)
-        self.view.figure.canvas.draw()
+        self.view.figure.canvas.draw_idle()
         self.view.figure.show()
 
 
 
 
-    def conv_radial(self, r, theta):
+    def _on_draw(self, event):
+        """ Called after every full draw of the figure. Captures the new
+        background and then draws the animated artists on top of it. """
+
+        # When the figure is being saved, animated artists are drawn along
+        # with everything else.
+        canvas = self.view.figure.canvas
+        if canvas.is_saving():
+            return
+
+        if canvas.supports_blit:
+            self._bg = canvas.copy_from_bbox(self.view.bbox)
+        self._bread_drawn = len(self.breadcrumbs)
+        self._draw_animated(event.renderer)
+
+
+
+
+    def _draw_animated(self, renderer):
+        """ Draws the `scan_field` and the scan points, which must be drawn
+        over it, in order of their `zorders`. """
+
+        for a in sorted([self.scan_field, self._ir_col, self._sonar_col],
+                                                 key = lambda a: a.zorder):
+            a.draw(renderer)
+
+
+
+
+    def _blit(self, *artists):
+        """ Updates the view after the given `artists` have changed, without
+        re-rendering everything else. The `artists` are drawn over the cached
+        background, which is then re-captured to include them, and the
+        animated artists are drawn last. Falls back to `draw()` when there is
+        no valid background.
+
+        Nothing is drawn over the `artists` other than the animated artists,
+        so they must not be overlapped by anything else in the background.
+        """
+
+        canvas = self.view.figure.canvas
+        if self._draw_depth > 0:
+            if self._blit_pending is None:
+                self._blit_pending = []
+            self._blit_pending.extend(a for a in artists
+                                        if a not in self._blit_pending)
+            return
+        if self._bg is None or not canvas.supports_blit:
+            self.draw()
+            return
+
+        canvas.restore_region(self._bg)
+        if len(artists) > 0:
+            for a in sorted(artists, key = lambda a: a.zorder):
+                if a is self._bread_col:
+                    self._draw_new_breadcrumbs()
+                else:
+                    self.view.draw_artist(a)
+            self._bg = canvas.copy_from_bbox(self.view.bbox)
+        self._draw_animated(canvas.get_renderer())
+        canvas.blit(self.view.bbox)
+
+
+
+
+    def _draw_new_breadcrumbs(self):
+        """ Draws just those breadcrumbs which aren't yet part of the
+        background. (Drawing the others over it again would darken their
+        anti-aliased edges every time.) """
+
+        if self._bread_drawn < len(self.breadcrumbs):
+            self._bread_col.set_offsets(self.breadcrumbs[self._bread_drawn:])
+            self.view.draw_artist(self._bread_col)
+            self._bread_col.set_offsets(self.breadcrumbs)
+            self._bread_drawn = len(self.breadcrumbs)
+
+
+
+
+    def conv_radial(self, theta, r):
         """ Uses the rover's current orientation in the environment (i.e. its
         current location and angle) to map a single radial point into the
         cartesian environment presented by `env` view. Returns a 2-tuple, whose
         first entry is the x location and whose second entry is the y location.
         """
 
-        theta_prime = (theta - 90.0 + self._direction) * (np.pi / 180.0)
-        return (r * np.cos(theta_prime) + self._loc[0],
-                r * np.sin(theta_prime) + self._loc[1])
+        return radial.rt2xy(theta, r, self._direction,
+                            self._loc[0], self._loc[1])
 
 
 
 
-    def conv_radial_arr(self, rs, thetas):
+    def conv_radial_arr(self, thetas, rs, out = None):
         """ Uses the rover's current orientation in the environment (i.e. its
         current location and angle) to map these radial points into the
         cartesian environment presented by `env` view.
@@ -385,28 +769,207 @@ class Environment():
         `thetas` is an `np.ndarray` of angles (measured in degrees), and `rs` is
         a `np.ndarray` of the corresponding radial distances.
 
-        A newly created `np.ndarray` with two columns returned. For each
-        (theta, r) pair in the inputs, a single (x, y) coordinate will be in
-        this returned array.
+        The results are written into `out`, an `np.ndarray` with two columns
+        and one row for each (theta, r) pair, and `out` is returned. For each
+        such pair, a single (x, y) coordinate will be in this array. If `out`
+        is not given, a new array is created.
         """
 
-        # TODO: reimplement this using `radial_to_env()` as a numpy `ufunc`.
-
         if len(thetas) != len(rs):
             raise ValueError("`thetas` and `rs` must be of the same length.")
 
-        # Make the given angles w.r.t. the 0 degrees of the `env`, convert
-        # them to radians, and make a copy them to the other column:
-        rv = np.empty((len(rs), 2), dtype = np.float64)
-        rv[:, 0] = thetas - 90.0 + self._direction
-        rv[:, 0] *= np.pi / 180.0
-        rv[:, 1] = rv[:, 0]
+        n = len(rs)
+        if out is None:
+            out = np.empty((n, 2), dtype = np.float64)
 
-        # Find the `x` and `y` values w.r.t. the origin of `env`:
-        rv[:, 0] = rs * np.cos(rv[:, 0]) + self._loc[0]
-        rv[:, 1] = rs * np.sin(rv[:, 1]) + self._loc[1]
+        # Rather than shifting each angle by -90 degrees and then rotating it
+        # by `_direction`, the cosines and sines of the scan angles themselves
+        # are combined with those of the direction, which are cached whenever
+        # the direction changes. Since
+        #
+        #   cos(theta - 90 + d) = sin(theta) cos(d) + cos(theta) sin(d)
+        #   sin(theta - 90 + d) = sin(theta) sin(d) - cos(theta) cos(d)
+        #
+        # the only trigonometry left is on `thetas`, which is independent of
+        # the rover's orientation and so can be reused between scans.
+        ct, st = self._theta_trig(thetas)
+        cd, sd = self._cos_dir, self._sin_dir
+        x0, y0 = self._loc
 
-        return rv
+        # The rover hasn't moved from its initial orientation, in which case
+        # there is no rotation or translation to apply:
+        if self._direction == 90.0 and self._loc == (0.0, 0.0):
+            np.multiply(rs, ct, out = out[:, 0])
+            np.multiply(rs, st, out = out[:, 1])
+            return out
+
+        if radial.rot_arr is not None:
+            radial.rot_arr(ct, st, rs, cd, sd, x0, y0, out)
+            return out
+
+        # The scratch buffer is kept between calls, and is only reallocated
+        # when a longer scan than any seen before is converted:
+        if self._scratch.shape[1] < n:
+            self._scratch = np.empty((2, n), dtype = np.float64)
+        a = self._scratch[0, :n]
+        b = self._scratch[1, :n]
+
+        np.multiply(st, cd, out = a)
+        np.multiply(ct, sd, out = b)
+        a += b
+        np.multiply(rs, a, out = out[:, 0])
+        out[:, 0] += x0
+
+        np.multiply(st, sd, out = a)
+        np.multiply(ct, cd, out = b)
+        a -= b
+        np.multiply(rs, a, out = out[:, 1])
+        out[:, 1] += y0
+
+        return out
+
+
+
+
+    def _theta_trig(self, thetas):
+        """ Returns the 2-tuple `(np.cos(thetas), np.sin(thetas))`, where
+        `thetas` is measured in degrees. The result for the most recent
+        `thetas` is remembered, since consecutive scans almost always use the
+        same grid of servo angles. (Equality rather than `id()` is checked,
+        because the ids of arrays which have been freed get reused.) """
+
+        if self._trig_thetas is None or \
+                                not np.array_equal(self._trig_thetas, thetas):
+            # Scan angles are almost always whole degrees, whose cosines and
+            # sines can just be looked up. They are only cast to integers once
+            # they are known to be within [0, 180], and so not NaN.
+            idx = None
+            if np.all((thetas >= 0) & (thetas <= 180)):
+                idx = thetas.astype(np.intp)
+            if idx is not None and np.array_equal(idx, thetas):
+                self._trig = (radial.COS_DEG[idx], radial.SIN_DEG[idx])
+            else:
+                tr = np.deg2rad(thetas, dtype = np.float64)
+                self._trig = (np.cos(tr), np.sin(tr))
+            self._trig_thetas = np.array(thetas, copy = True)
+
+        return self._trig
+
+
+
+
+
+
+
+
+
+class GLEnvironment(Environment):
+    """ An `Environment` whose `view` is a `pyqtgraph` plot rather than a
+    matplotlib axis. Its points are rendered by Qt (with OpenGL, if enabled),
+    so redrawing stays fast as scan points accumulate over a mission. This
+    requires `pyqtgraph`, which is only imported once a `GLEnvironment` is
+    created, so that it isn't loaded along with a Qt binding by those who
+    only use matplotlib. """
+
+    __slots__ = ('_circles',)
+
+    def _init_view(self):
+        try:
+            import pyqtgraph
+        except ImportError:
+            raise ImportError("`GLEnvironment` requires `pyqtgraph`.")
+
+        self.view = pyqtgraph.plot()
+        self.view.setAspectLocked(True)
+        self.view.setXRange(-300, 300, padding = 0)
+        self.view.setYRange(-300, 300, padding = 0)
+
+        # Breadcrumbs and dangers are all spots of this one item. Their sizes
+        # are measured in `env` units rather than in pixels.
+        self._circles = pyqtgraph.ScatterPlotItem(pxMode = False, pen = 'k',
+                                                  brush = (166, 166, 166))
+        self._circles.setZValue(zorders['breadcrumbs'])
+        self.view.addItem(self._circles)
+
+        self._ir_col = pyqtgraph.ScatterPlotItem(pxMode = True, useCache = True,
+                                            size = 4, pen = None, brush = 'b')
+        self._ir_col.setZValue(zorders['scan_data'])
+        self.view.addItem(self._ir_col)
+
+        self._sonar_col = pyqtgraph.ScatterPlotItem(pxMode = True,
+                            useCache = True, size = 3, pen = None, brush = 'g')
+        self._sonar_col.setZValue(zorders['scan_data'])
+        self.view.addItem(self._sonar_col)
+
+        self.update_scan_field()
+
+
+
+    def __del__(self):
+        try:
+            self.view.close()
+        except AttributeError:
+            pass  # There is no plot, e.g. since `pyqtgraph` wasn't found.
+        except RuntimeError:
+            pass  # Qt has already deleted the plot, e.g. during shutdown.
+
+
+
+    def _update_scan_pts(self):
+        self._ir_col.setData(pos = self._ir_pts)
+        self._sonar_col.setData(pos = self._sonar_pts)
+
+
+
+    def add_breadcrumb(self):
+        self._add_circle(BREADCRUMB_RADIUS, zorders['breadcrumbs'])
+        self.breadcrumbs.append(self._loc)
+        self.draw()
+
+
+
+    def _add_circle(self, radius, zorder):
+        self._circles.addPoints(pos = [self._loc], size = 2 * radius)
+        return self._loc
+
+
+
+    def update_scan_field(self):
+        import pyqtgraph
+
+        # Approximate the semi-circle with a filled polygon:
+        phis = np.deg2rad(np.linspace(self._direction - 90,
+                                      self._direction + 90, 61))
+        x0, y0 = self._loc
+        xs = np.r_[x0, x0 + 100 * np.cos(phis), x0]
+        ys = np.r_[y0, y0 + 100 * np.sin(phis), y0]
+
+        if self.scan_field is None:
+            self.scan_field = pyqtgraph.PlotCurveItem(pen = None,
+                           brush = (230, 230, 230), fillLevel = 'enclosed')
+            self.scan_field.setZValue(zorders['scan_field'])
+            self.view.addItem(self.scan_field)
+        self.scan_field.setData(xs, ys)
+
+
+
+    def set_bounds(self, xlim, ylim):
+        self.view.setXRange(xlim[0], xlim[1], padding = 0)
+        self.view.setYRange(ylim[0], ylim[1], padding = 0)
+        self.draw()
+
+
+
+    def _draw(self):
+        import pyqtgraph
+
+        # Qt repaints the plot on its own; just give it a chance to do so.
+        pyqtgraph.QtWidgets.QApplication.processEvents()
+
+
+
+    def _blit(self, *artists):
+        self.draw()
 
 
 
@@ -420,8 +983,10 @@ class Scanner():
     """ Displays a radial view of the immediate surroundings as generated by
     ir and servo radial distance data from a particular orientation. """
 
+    __slots__ = ('scans', 'contours', 'view', '_ir_col', '_sonar_col')
+
     def __init__(self):
-        # A list of 2-tuples generated by rover.scan():
+        # A list of 3-tuples generated by rover.scan():
         self.scans = []
 
         # A list of contours to be draw on the current scan:
@@ -429,6 +994,13 @@ class Scanner():
 
         # Startup the axis to be used for displaying scan data:
         self.view = plt.figure().add_subplot(111, projection = 'polar')
+
+        # The points of all scans are drawn by a single collection for each
+        # sensor:
+        self._ir_col = self.view.scatter([], [], s = 8, c = 'g',
+                                                     edgecolors = 'none')
+        self._sonar_col = self.view.scatter([], [], s = 7, c = 'b',
+                                                     edgecolors = 'none')
         self.draw()
 
 
@@ -439,83 +1011,113 @@ class Scanner():
 
 
     def add_scan(self, scan_data):
-        """ TODO
-        """
+        """ Adds the given `scan` data (expected to have been generated by
+        `rover.scan()`) to the scanner. """
         self.scans.append(scan_data)
-        
-        ''' DEBUG: drawing onto the scanner has been disabled
-        ir_data, sonar_data = scan_data
-        
-        angles = ir_data[:, 0] * (np.pi / 180.0)
-        rs = ir_data[:, 1]
-        self.view.scatter(angles, rs, 'g')
 
-        angles = sonar_data[:, 0] * (np.pi / 180.0)
-        rs = sonar_data[:, 1]
-        rs = rs[~np.isnan(rs)]
-        self.view.scatter(angles, rs, 'b')
-        '''
+        thetas, ir_rs, sonar_rs = scan_data
+        self._ir_col.set_offsets(np.vstack([self._ir_col.get_offsets(),
+                                            self._polar_pts(thetas, ir_rs)]))
+        self._sonar_col.set_offsets(np.vstack([self._sonar_col.get_offsets(),
+                                        self._polar_pts(thetas, sonar_rs)]))
 
         #self.draw()
 
 
 
+    def _polar_pts(self, thetas, rs):
+        """ Converts the given scan angles from degrees to radians and drops
+        every point whose distance is NaN, giving a two-column array of points
+        which can be plotted on the polar `view`. """
+
+        mask = ~np.isnan(rs)
+
+        rv = np.empty((np.count_nonzero(mask), 2), dtype = np.float64)
+        rv[:, 0] = thetas[mask] * (np.pi / 180.0)
+        rv[:, 1] = rs[mask]
+        return rv
+
+
+
     def clear_scans(self):
         self.scans.clear()
+        self._ir_col.set_offsets(np.empty((0, 2)))
+        self._sonar_col.set_offsets(np.empty((0, 2)))
+
+
+
+    def reset(self):
+        """ Readies the `Scanner` for the scans taken from a new orientation:
+        its scans and contours are dropped, but its `view` and collections
+        are kept, so nothing needs to be re-created per move. """
+
+        self.contours.clear()
+        self.clear_scans()
 
 
 
 
     def find_obj_clouds(self):
         """ Finds data from each distinct object generated across all scans.
+        Each object is represented by a 3-tuple of parallel `np.ndarray`
+        objects, just like a scan: the angles, sorted, followed by the IR and
+        then the sonar distances measured at those angles.
         """
 
-        comb_scans = ()
-        
         if len(self.scans) < 1:
             # There aren't any scans
             raise NotImplementedError()
-        
-        comb_scans = self.scans[0][0], self.scans[0][1]
-        
-        # Iterate through all scans
-        for i in range(1, len(self.scans)):
-            comb_scans = np.append(comb_scans[0], self.scans[i][0], axis=0), np.append(comb_scans[1], self.scans[i][1], axis=0)
 
-        # Sort each ndarray
-        comb_scans = np.sort(comb_scans[0], axis=0), np.sort(comb_scans[1], axis=0)
-        
-        # Create list of objects. 
-        # This should be a 2-tuple containing all scans with data points
-        # sorted. The first element should be a two column ndarray
-        # containing angles and their corresponding distances for IR.
-        # The second is the same, but for sonar. 
-        obj_list = []
-        
-        # Iterate through consolidated scans to find clumps of objects
+        # Combine all scans, copying each of them just once:
+        thetas = np.concatenate([s[0] for s in self.scans])
+        ir_rs = np.concatenate([s[1] for s in self.scans])
+        sonar_rs = np.concatenate([s[2] for s in self.scans])
+
+        # Sort the readings by angle. (The distances are gathered in the same
+        # order, so each stays with the angle at which it was measured.)
+        order = np.argsort(thetas, kind = 'stable')
+        thetas, ir_rs, sonar_rs = thetas[order], ir_rs[order], sonar_rs[order]
+
         min_width = 3 # minimum degrees for an object to be recognized
-        
-        prev_angle = comb_scans[0][0][0]
-        start = 0 # start index for the current object
-
-         # Go through all IR data
-        for i in range(0, len(comb_scans[0])):
-            # If the reading is nan for IR, throw it out.
-            if math.isnan(comb_scans[0][i][1]):
-                comb_scans = np.delete(comb_scans[0],i,0), np.delete(comb_scans[1],i,0)
-        
-            # Check for jumps in the non-NaN data, indicating a new object.
-            if comb_scans[0][i][0] - prev_angle > 1:
-                obj = comb_scans[0][start:i], comb_scans[1][start:i]
-                start = i
-                obj_list.append(obj)
 
-            prev_angle = comb_scans[0][i][0]
-        
+        # Throw out every reading where the IR distance is NaN, along with the
+        # sonar distance measured with it.
+        valid = ~np.isnan(ir_rs)
+        thetas, ir_rs, sonar_rs = thetas[valid], ir_rs[valid], sonar_rs[valid]
+
+        # Jumps in the angles of the remaining data indicate a new object. Each
+        # object is the run of readings between two consecutive jumps.
+        breaks = np.flatnonzero(np.diff(thetas) > 1) + 1
+        starts = np.r_[0, breaks]
+        ends = np.r_[breaks, len(thetas)]
+
+        # Keep only those objects which are wide enough:
+        keep = ends > starts
+        starts, ends = starts[keep], ends[keep]
+        widths = thetas[ends - 1] - thetas[starts]
+        keep = widths >= min_width
+
+        obj_list = [(thetas[i:j], ir_rs[i:j], sonar_rs[i:j])
+                                    for i, j in zip(starts[keep], ends[keep])]
+
         return obj_list
 
 
 
+    def gen_contours(self):
+        """ Regresses a contour from the IR data of each object cloud found
+        across all scans. These are stored in `contours` and returned.
+
+        (Each fit takes well under a millisecond, which is less than it would
+        take just to send its cloud to a worker process, so they are done
+        here.) """
+
+        self.contours = [_regress_object_cloud(thetas, ir_rs)
+                            for thetas, ir_rs, _ in self.find_obj_clouds()]
+        return self.contours
+
+
+
     def draw(self):
         pass
         """ DEBUG: drawing of the scanner has been disabled
@@ -536,9 +1138,19 @@ class Rover():
     """ TODO
     """
 
-    def __init__(self, sen = None, calib_dir = None, debug = False):
+    __slots__ = ('sen', 'ir_conv', 'sonar_conv', 'servo_conv', 'env',
+                 'scanner')
+
+    def __init__(self, sen = None, calib_dir = None, debug = False,
+                                                           backend = 'mpl'):
         """ TODO
+
+        The `env` is plotted with matplotlib if `backend` is `'mpl'`, and
+        with `pyqtgraph` if it is `'gl'` (see `GLEnvironment`).
         """
+        if backend not in {'mpl', 'gl'}:
+            raise ValueError("The argument `backend` must be 'mpl' or 'gl'")
+
         if debug == True:
             sen = "DEBUG"
         elif sen is None:
@@ -560,7 +1172,15 @@ class Rover():
         # TODO: implement move_conv
         # TODO: implement rotate_conv
 
-        self.env = Environment()
+        # The scan grid of the full range is generated up front. (It is
+        # cached at module level, rather than by the `Rover`, so that the
+        # cache doesn't keep the `Rover` alive.)
+        _scan_grid(self.servo_conv, 0, 180)
+
+        if backend == 'gl':
+            self.env = GLEnvironment()
+        else:
+            self.env = Environment()
         self.scanner = Scanner()
 
 
@@ -581,13 +1201,12 @@ class Rover():
         `start` angle to the `end` angle. Note that both are assumed to be
         integers and measured in degrees.
 
-        The return value is a 2-tuple, where both elements are an
-        `np.ndarray` object. The first element of the pair is the ir data 
-        generated by a scan, while the second element is the sonar data. Both
-        arrays have angles (measured in degrees) in their first column and
-        corresponding radial distances (measured in in cm) in the second
-        column. The `Rover` object's converters have been used in generating
-        this data.
+        The return value is a 3-tuple of parallel, one-dimensional
+        `np.ndarray` objects of type `np.float32`. The first holds the angles
+        (measured in degrees) at which readings were taken, while the second
+        and third hold the corresponding radial distances (measured in cm)
+        found by IR and by sonar, respectively. The `Rover` object's
+        converters have been used in generating this data.
 
         If and only if `updt_scan` is true, will the results be automatically
         passed to the current `Scanner` object. Similarly, if and only if
@@ -599,40 +1218,31 @@ class Rover():
         counter-clockwise) depending on which angle is bigger than the other.
         """
 
-        # Generate a pulse width for each angle:
-        if start <= end:
-            angles = np.array([i for i in range(start, end + 1)],
-                                                 dtype = np.float64)
-        else:
-            angles = nd.array([i for i in range(start, end - 1, -1)],
-                                                 dtype = np.float64)
-
-        pulse_widths = self.servo_conv(angles)
+        # Look up the angles of this scan and their pulse widths:
+        angles, pulse_widths = _scan_grid(self.servo_conv, start, end)
 
         # Perform the scan, then return the servo to 90 degrees.
         ir_data, sonar_data = sensors.scan(self.sen, pulse_widths)
         servo.pulse_width(self.sen, self.servo_conv(90.0))
 
         # Perform the conversion from raw readings to distances.
-        ir_data[:] = self.ir_conv(ir_data[:])
-        sonar_data[:] = self.sonar_conv(sonar_data[:])
-
-        # Construct the return value by adding the angle columns:
-        rv = (np.empty((len(ir_data), 2)), np.empty((len(sonar_data), 2)))
-        rv[0][:, 1] = ir_data
-        rv[1][:, 1] = sonar_data
-        for idx, a in enumerate(angles):
-            offset = idx * 5
-            rv[0][offset: offset + 5, 0] = a
-            rv[1][offset: offset + 5, 0] = a
-        
+        ir_rs = self.ir_conv(ir_data).astype(np.float32, copy = False)
+        sonar_rs = self.sonar_conv(sonar_data).astype(np.float32, copy = False)
+
+        # Five readings of each sensor were taken at every angle:
+        thetas = np.repeat(angles, 5).astype(np.float32)
+
+        rv = (thetas, ir_rs, sonar_rs)
+
+
         # Report findings to relevant authorities.
         if updt_scan == False and updt_env == False:
             return rv
-        if updt_scan == True:
-            self.scanner.add_scan(rv)
-        if updt_env == True:
-            self.env.add_scan(rv)
+        with self.env.batch():
+            if updt_scan == True:
+                self.scanner.add_scan(rv)
+            if updt_env == True:
+                self.env.add_scan(rv)
 
 
 
@@ -641,14 +1251,15 @@ class Rover():
         """ Moves the rover, adds a breadcrumb, updates the rovers location in
         `env`, and adds to `env` any dangers that were found. """
 
-        self.gen_objects()
+        with self.env.batch():
+            self.gen_objects()
 
-        # TODO: use move_conv to correct for rover sensor error.
-        dist, stop_reason = oi.move(self.sen, dist, speed)
-        self.env.move(dist)
+            # TODO: use move_conv to correct for rover sensor error.
+            dist, stop_reason = oi.move(self.sen, dist, speed)
+            self.env.move(dist)
 
-        if stop_reason != OIStopID.full_distance:
-            self.env.add_danger(stop_reason)
+            if stop_reason != OIStopID.full_distance:
+                self.env.add_danger(stop_reason)
 
 
 
@@ -658,11 +1269,12 @@ class Rover():
         (measured in degrees), and updates the rover's current direction.
         This will convert scan data into objects. """
 
-        self.gen_objects()
+        with self.env.batch():
+            self.gen_objects()
 
-        # TODO: use `rotate_conv` to correct for rover sensor error.
-        oi.rotate(self.sen, delta)
-        self.env.rotate(delta)
+            # TODO: use `rotate_conv` to correct for rover sensor error.
+            oi.rotate(self.sen, delta)
+            self.env.rotate(delta)
         
         
         
@@ -683,14 +1295,11 @@ class Rover():
         # Add an object for each cloud found to `env`.
         for cloud in self.scanner.find_obj_clouds():
 
-            ir_data, sonar_data = cloud
-            ir_angles = ir_data[:, 0]
-            bounds = (min(ir_angles), max(ir_angles))
+            thetas, ir_rs, sonar_rs = cloud
+            bounds = (thetas[0], thetas[-1])
 
-            angular_mean = np.mean([np.mean(ir_data[:, 0]),
-                                    np.mean(sonar_data[:, 0])]
-            radial_mean = np.mean([np.mean(ir_data[:, 1]),
-                                   np.mean(sonar_data[:, 1])]
+            angular_mean = np.mean(thetas)
+            radial_mean = np.mean([np.mean(ir_rs), np.mean(sonar_rs)])
 
             # TODO: plot using better measure of radius.
             radius = (bounds[1] - bounds[0]) / 2.0
@@ -698,5 +1307,4 @@ class Rover():
             self.env.add_object(angular_mean, radial_mean, radius)
 
         self.env.clear_scans()
-        self.scanner.clear_scans()
-        self.env.draw()
+        self.scanner.reset()
@@ -4,7 +4,6 @@
 import sys
 import csv
 import time
-import struct
 
 import numpy as np
 import matplotlib.pyplot as plt
@@ -19,8 +18,8 @@ import codes
 def scan(sen, pulse_widths):
     """ This communicates with the rover to efficiently generate raw
     distance readings from both IR and sonar. The `pulse_widths` argument
-    is expected to be a list of integer values. For each pulse width in
-    this list, the rover's servo will move to that position and collect 
+    is expected to be a list or `np.ndarray` of integer values. For each pulse
+    width in it, the rover's servo will move to that position and collect
     five raw readings from each of these sensors.
 
     (Note that we say *efficiently*, because we found scanning to be too
@@ -28,10 +27,10 @@ def scan(sen, pulse_widths):
     commands individually (ie. it was too slow to send and recieve a
     servo.pulse_width(), ir.readings(), and sonar.readings() for each angle).
 
-    The return value is a 2-tuple, where both elements are an
-    `np.ndarray` object. The first element of the pair is a column vector of
-    raw IR data readings, and the second element is a column vector of the raw
-    sonar readings.
+    The return value is a 2-tuple, where both elements are an `np.ndarray`
+    object of type `np.float32`. The first element of the pair is a column
+    vector of raw IR data readings, and the second element is a column vector
+    of the raw sonar readings.
 
     At each angle, the rover will record 5 IR readings and 5 sonar
     readings. So the method call will, in total, prompt
@@ -45,15 +44,16 @@ def scan(sen, pulse_widths):
         raise Exception('The number of pulse widths in the given list must be '
                                            'in the range [1..200], inclusive.')
 
-    # Allocate the results arrays:
-    num_rows = 5 * len(pulse_widths)
-    ir_data = np.empty(shape = (num_rows,))
-    sonar_data = np.empty(shape = (num_rows,))
+    # Each pulse width is sent as a 16-bit unsigned integer, so it must fit
+    # in one. (Casting to that type would silently wrap it around instead.)
+    pulse_widths = np.asarray(pulse_widths)
+    if np.any(pulse_widths < 0) or np.any(pulse_widths > 0xFFFF):
+        raise Exception('Each pulse width must be in the range [0..65535], '
+                                                                'inclusive.')
 
-    # Generate the request's framed data:
-    tx_data = bytearray(2 * len(pulse_widths))
-    for i, w in enumerate(pulse_widths):
-        struct.pack_into('<H', tx_data, i * 2, w)
+    # Generate the request's framed data, a little-endian 16-bit unsigned
+    # integer for each pulse width:
+    tx_data = bytearray(pulse_widths.astype('<u2').tobytes())
 
     # Send the message, and listen for the response:
     sen.tx_mesg(codes.MesgID.scan, data = tx_data)
@@ -65,13 +65,14 @@ def scan(sen, pulse_widths):
         raise Exception('Expected ' + str(expected_len) + ' bytes of data, but '
         								       'received ' + str(len(rx_data)))
 
-    # Unpack the recieved data into `ir_data` and `sonar_data`:
-    for i in range(len(pulse_widths)):
-        buf_offset = i*20  # For each pulse width, 20 bytes were delivered.
-        arr_offset = i*5   # For each pulse width, 5 readings were performed by each sensor.
-        ir_data[arr_offset: arr_offset+5] = struct.unpack_from('<HHHHH', rx_data, buf_offset)
-        sonar_data[arr_offset: arr_offset+5] = struct.unpack_from('<HHHHH', rx_data, buf_offset + 10)
-    
+    # Unpack the recieved data into `ir_data` and `sonar_data`. For each pulse
+    # width, 20 bytes were delivered: 5 IR readings followed by 5 sonar
+    # readings, each a little-endian 16-bit unsigned integer.
+    readings = np.frombuffer(rx_data, dtype = '<u2')
+    readings = readings.reshape((len(pulse_widths), 2, 5))
+    ir_data = readings[:, 0, :].astype(np.float32).ravel()
+    sonar_data = readings[:, 1, :].astype(np.float32).ravel()
+
     return (ir_data, sonar_data)
 
 
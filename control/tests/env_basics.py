@@ -0,0 +1,53 @@
+# env_basics.py - checks how the `env` view is redrawn, without a rover.
+
+import tempfile
+
+import numpy as np
+
+import rover
+
+# A `Rover` in debug mode, with made-up calibration data:
+calib_dir = tempfile.mkdtemp()
+np.savetxt(calib_dir + "/servo.csv", np.c_[[0, 180], [1000, 2000]],
+                                                         delimiter = ',')
+np.savetxt(calib_dir + "/ir.csv", np.c_[np.linspace(10, 80, 20),
+                             np.linspace(2000, 300, 20)], delimiter = ',')
+np.savetxt(calib_dir + "/sonar.csv", np.c_[np.linspace(3, 300, 20),
+                             np.linspace(100, 20000, 20)], delimiter = ',')
+r = rover.Rover(calib_dir = calib_dir, debug = True)
+
+# Count the full draws and the blits of the `env` canvas:
+canvas = r.env.view.figure.canvas
+counts = {'draw': 0, 'blit': 0}
+
+def counted(name, f):
+    def g(*args, **kwargs):
+        counts[name] += 1
+        return f(*args, **kwargs)
+    return g
+
+canvas.draw = counted('draw', canvas.draw)
+canvas.blit = counted('blit', canvas.blit)
+
+# Stands in for `r.scan()`, which reports a scan to both of these:
+thetas = np.repeat(np.arange(0, 181), 5).astype(np.float32)
+ir_rs = np.full(len(thetas), np.nan, dtype = np.float32)
+ir_rs[(thetas >= 40) & (thetas <= 60)] = 50.0
+sonar_rs = np.full(len(thetas), 60.0, dtype = np.float32)
+
+def scan():
+    with r.env.batch():
+        r.scanner.add_scan((thetas, ir_rs, sonar_rs))
+        r.env.add_scan((thetas, ir_rs, sonar_rs))
+
+# Neither scanning nor moving nor rotating should need a full draw.
+scan()
+assert counts == {'draw': 0, 'blit': 1}, counts
+r.move(10)
+assert counts == {'draw': 0, 'blit': 2}, counts
+scan()
+r.rotate(10)
+assert counts == {'draw': 0, 'blit': 4}, counts
+assert len(r.env.objects) == 2 and len(r.env.breadcrumbs) == 1
+
+print("ok")
@@ -0,0 +1,52 @@
+# scan_basics.py - checks the processing of scan data, without a rover.
+
+import math
+
+import numpy as np
+
+import rover
+
+# Map a scan into `env` from a pose other than the initial one, and compare
+# the result against the direct formula.
+env = rover.Environment()
+env.loc((12.5, -40.0))
+env.direction(90.0 + 35.0)
+
+thetas = np.repeat(np.arange(0, 181), 5).astype(np.float32)
+rs = np.linspace(10.0, 90.0, len(thetas)).astype(np.float32)
+
+x0, y0 = env.loc()
+phis = np.deg2rad(thetas.astype(np.float64) - 90.0 + env.direction())
+expected = np.c_[rs * np.cos(phis) + x0, rs * np.sin(phis) + y0]
+
+np.testing.assert_allclose(env.conv_radial_arr(thetas, rs), expected,
+                                                           atol = 1e-6)
+np.testing.assert_allclose(env.conv_radial(30.0, 50.0),
+        (50.0 * math.cos(math.radians(30.0 - 90.0 + env.direction())) + x0,
+         50.0 * math.sin(math.radians(30.0 - 90.0 + env.direction())) + y0))
+
+# Split a scan with gaps of NaN readings into object clouds. The object at
+# [60..61] is too narrow to be kept, and the last object runs up to the end
+# of the scan.
+ir_rs = np.full(len(thetas), np.nan, dtype = np.float32)
+for start, end in [(20, 40), (60, 61), (100, 130), (170, 180)]:
+    ir_rs[(thetas >= start) & (thetas <= end)] = 50.0
+sonar_rs = np.full(len(thetas), 60.0, dtype = np.float32)
+
+# The same readings are split across two scans, in opposite directions, so
+# that the clouds must be sorted back together.
+half = len(thetas) // 2
+scanner = rover.Scanner()
+scanner.add_scan((thetas[half:][::-1], ir_rs[half:][::-1],
+                                         sonar_rs[half:][::-1]))
+scanner.add_scan((thetas[:half], ir_rs[:half], sonar_rs[:half]))
+
+clouds = scanner.find_obj_clouds()
+bounds = [(float(c[0][0]), float(c[0][-1])) for c in clouds]
+assert bounds == [(20.0, 40.0), (100.0, 130.0), (170.0, 180.0)], bounds
+for c_thetas, c_ir_rs, c_sonar_rs in clouds:
+    assert len(c_thetas) == len(c_ir_rs) == len(c_sonar_rs)
+    assert np.all(np.diff(c_thetas) >= 0)
+    assert not np.any(np.isnan(c_ir_rs))
+
+print("ok")